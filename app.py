@@ -1,7 +1,7 @@
 import streamlit as st
+import hashlib
 import os
 from pdf_processor import PDFProcessor
-from summarizer import PDFSummarizer
 from utils import (
     validate_api_key,
     estimate_processing_time,
@@ -20,6 +20,31 @@ st.set_page_config(
     layout="wide"
 )
 
+# Cached document text lives in server memory, so keep only a few recent documents
+CACHE_MAX_ENTRIES = 16
+CACHE_TTL = "1h"
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def extract_and_clean(file_hash: str, _pdf_bytes: bytes, _processor: PDFProcessor):
+    """Extract, clean and count tokens for a PDF; cached on the file hash"""
+    raw_text = _processor.extract_text_from_pdf(_pdf_bytes)
+    clean_text = _processor.clean_text(raw_text)
+    token_count = _processor.count_tokens(clean_text)
+    # Only the raw length is displayed, so don't keep the raw text in the cache
+    return len(raw_text), clean_text, token_count
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def chunk_text_cached(file_hash: str, _clean_text: str, max_tokens: int, _processor: PDFProcessor):
+    """Split cleaned text into chunks; cached on the file hash and chunk size"""
+    return _processor.chunk_text(_clean_text, max_tokens)
+
+def get_summarizer():
+    """Create the summarizer on first use; importing LangChain is slow, so it waits until a PDF is processed"""
+    if 'summarizer' not in st.session_state:
+        from summarizer import PDFSummarizer
+        st.session_state.summarizer = PDFSummarizer()
+    return st.session_state.summarizer
+
 def main():
     st.title("📄 PDF Reader + AI Summarizer")
     st.markdown("Upload a PDF document and get intelligent summaries powered by OpenRouter.")
@@ -32,9 +57,6 @@ def main():
     if 'pdf_processor' not in st.session_state:
         st.session_state.pdf_processor = PDFProcessor()
 
-    if 'summarizer' not in st.session_state:
-        st.session_state.summarizer = PDFSummarizer()
-
     # Sidebar settings
     st.sidebar.header("⚙ Settings")
 
@@ -73,9 +95,17 @@ def main():
     if uploaded_file is not None:
         st.success(f"✅ File uploaded: {uploaded_file.name}")
 
+        # Read the upload into bytes once; metadata and extraction both parse from them
+        if st.session_state.get('pdf_file_id') != uploaded_file.file_id:
+            st.session_state.pdf_file_id = uploaded_file.file_id
+            st.session_state.pdf_bytes = uploaded_file.getvalue()
+            st.session_state.pdf_hash = hashlib.blake2b(st.session_state.pdf_bytes, digest_size=16).hexdigest()
+        pdf_bytes = st.session_state.pdf_bytes
+        pdf_hash = st.session_state.pdf_hash
+
         # Display PDF metadata
         with st.spinner("Analyzing PDF metadata..."):
-            metadata = st.session_state.pdf_processor.get_pdf_metadata(uploaded_file)
+            metadata = st.session_state.pdf_processor.get_pdf_metadata(pdf_bytes)
 
         col1, col2 = st.columns(2)
         with col1:
@@ -87,38 +117,38 @@ def main():
 
         # Process PDF button
         if st.button("🚀 Process PDF", type="primary"):
-            process_pdf(uploaded_file, summary_type, max_tokens, show_analysis, show_quotes)
+            process_pdf(uploaded_file, pdf_bytes, pdf_hash, summary_type, max_tokens, show_analysis, show_quotes)
 
-def process_pdf(uploaded_file, summary_type, max_tokens, show_analysis, show_quotes):
+def process_pdf(uploaded_file, pdf_bytes, pdf_hash, summary_type, max_tokens, show_analysis, show_quotes):
     """Process the PDF and generate summaries"""
 
+    processor = st.session_state.pdf_processor
+    summarizer = get_summarizer()
+
     # Step 1: Extract text
     with st.spinner("📖 Extracting text from PDF..."):
         try:
-            raw_text = st.session_state.pdf_processor.extract_text_from_pdf(uploaded_file)
-            st.success(f"✅ Extracted {len(raw_text)} characters")
+            raw_length, clean_text, token_count = extract_and_clean(pdf_hash, pdf_bytes, processor)
+            st.success(f"✅ Extracted {raw_length} characters")
         except Exception as e:
             st.error(f"❌ Error extracting text: {str(e)}")
             return
 
-    # Step 2: Clean text
-    with st.spinner("🧹 Cleaning and processing text..."):
-        clean_text = st.session_state.pdf_processor.clean_text(raw_text)
-        token_count = st.session_state.pdf_processor.count_tokens(clean_text)
-        st.success(f"✅ Cleaned text: {len(clean_text)} characters, ~{token_count} tokens")
+    # Step 2: Clean text (done by extract_and_clean above so both steps share one cache entry)
+    st.success(f"✅ Cleaned text: {len(clean_text)} characters, ~{token_count} tokens")
 
     # Step 3: Chunk text
     with st.spinner("✂ Splitting text into chunks..."):
-        chunks = st.session_state.pdf_processor.chunk_text(clean_text, max_tokens)
+        chunks = chunk_text_cached(pdf_hash, clean_text, max_tokens, processor)
         st.success(f"✅ Created {len(chunks)} chunks")
 
-        estimated_time = estimate_processing_time(len(chunks))
+        estimated_time = estimate_processing_time(len(chunks), concurrency=summarizer.max_concurrent)
         st.info(f"⏱ Estimated processing time: {estimated_time}")
 
     # Step 4: Document analysis (optional)
     if show_analysis:
         with st.spinner("🔍 Analyzing document structure..."):
-            analysis = st.session_state.summarizer.analyze_document_structure(clean_text)
+            analysis = summarizer.analyze_document_structure(clean_text)
             if analysis['status'] == 'success':
                 st.subheader("📊 Document Analysis")
                 st.write(analysis['analysis'])
@@ -129,9 +159,14 @@ def process_pdf(uploaded_file, summary_type, max_tokens, show_analysis, show_quo
     with st.spinner(f"🤖 Generating {summary_type} summaries..."):
         progress_bar = st.progress(0)
         status_text = st.empty()
+        # Render the final summary as it streams in; the full results are shown below once done
+        live_summary = st.empty()
 
         try:
-            summary_data = st.session_state.summarizer.summarize_chunks(chunks, summary_type)
+            summary_data = summarizer.summarize_chunks(
+                chunks, summary_type, on_token=live_summary.markdown
+            )
+            live_summary.empty()
             progress_bar.progress(1.0)
             status_text.success("✅ Summaries generated successfully!")
         except Exception as e:
@@ -141,7 +176,7 @@ def process_pdf(uploaded_file, summary_type, max_tokens, show_analysis, show_quo
     # Step 6: Extract key quotes (optional)
     if show_quotes:
         with st.spinner("💬 Extracting key quotes..."):
-            quotes = st.session_state.summarizer.extract_key_quotes(clean_text[:5000])
+            quotes = summarizer.extract_key_quotes(clean_text[:5000])
             st.subheader("💬 Key Quotes")
             for i, quote in enumerate(quotes, 1):
                 st.write(f"{i}. *\"{quote}\"*")
@@ -0,0 +1,51 @@
+# Import PyMuPDF to read text from PDF pages
+import pymupdf
+
+# Import shared memory so worker processes can read the PDF without it being pickled per task
+from multiprocessing import shared_memory
+
+# Import typing hints to specify expected types for function arguments and return values
+from typing import List
+
+# This module is what extraction worker processes import, so it deliberately
+# avoids tiktoken and anything else that is expensive to load at import time
+
+
+def extract_pages(doc: pymupdf.Document, start: int, stop: int) -> List[str]:
+    """
+    Extracts text for pages [start, stop) of an open document, each preceded by a page marker.
+
+    Text blocks within a page are separated by a blank line, which clean_text and
+    chunk_text treat as the paragraph boundary.
+    """
+    parts: List[str] = []
+    for page_num in range(start, stop):
+        try:
+            # Extract the page's text blocks (type 0; type 1 is images), skipping graphics operators.
+            # get_text("text") puts no blank line between blocks, so join them with one here
+            blocks = doc[page_num].get_text("blocks")
+            page_text = "\n\n".join(block[4].strip() for block in blocks if block[6] == 0 and block[4].strip())
+            # Append the extracted text with a page marker
+            parts.append(f"\n--- Page {page_num + 1} ---\n")
+            parts.append(page_text or "")
+        except Exception as e:
+            # If a page fails to extract, log and skip it
+            print(f"Error extracting page {page_num + 1}: {e}")
+            continue
+    return parts
+
+
+def extract_shared_page_range(shm_name: str, size: int, start: int, stop: int) -> List[str]:
+    """
+    Worker-process entry point: opens its own copy of the document held in the named
+    shared memory block and extracts pages [start, stop).
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # Copy out of the block so it can be closed while the document is still open
+        with shm.buf[:size] as view:
+            pdf_bytes = bytes(view)
+    finally:
+        shm.close()
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return extract_pages(doc, start, stop)
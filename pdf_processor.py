@@ -1,54 +1,135 @@
-# Import the PyPDF2 library to read and extract text and metadata from PDF files
-import PyPDF2
+# Import PyMuPDF to read and extract text and metadata from PDF files
+import pymupdf
+
+# Import os to size the tokenizer's batch thread pool and the extraction worker pool to the available cores
+import os
+
+# Import a process pool and shared memory to extract pages of long PDFs in parallel
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 
 # Import regular expressions for text pattern matching and cleaning
 import re
 
+# Import threading so concurrent Streamlit sessions create only one extraction pool
+import threading
+
 # Import typing hints to specify expected types for function arguments and return values
 from typing import List, Dict
 
+# Import the page extraction helpers; they live in their own module so worker processes don't load tiktoken
+from pdf_extraction import extract_pages, extract_shared_page_range
+
 # Import the tiktoken library for counting tokens based on a specific tokenizer model (useful for AI models like GPT)
 import tiktoken
 
+# Load the tokenizer once per process; building the BPE merge table is expensive,
+# so every PDFProcessor instance (and every Streamlit session) shares this one
+_ENC = tiktoken.get_encoding("cl100k_base")
+
+# Matches page markers like "--- Page 1 ---" and any special character outside common punctuation,
+# so clean_text can drop both in a single pass over the text
+_CLEAN_RE = re.compile(r'--- Page \d+ ---|[^\w\s.,!?;:\-()]')
+
+# Generous characters-per-token bound used to encode only the head of a long text when truncating
+_MAX_CHARS_PER_TOKEN = 16
+
+# Paragraph boundary: a blank line, possibly containing other whitespace
+_PARA_RE = re.compile(r'\n\s*\n')
+
+# Sentence boundary: whitespace after terminal punctuation and before a capital letter,
+# so "e.g. the" and decimals like "3.5" stay inside one sentence
+_SENT_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+
+# Pages each extraction worker must get before the document is split across processes.
+# Sequential extraction runs at roughly 1 ms per text page, while spawning the pool and
+# importing pymupdf costs about 0.2-1 s on first use, so a worker only pays for itself with
+# around a second of pages to extract
+_PARALLEL_MIN_PAGES = 1000
+
+# Extraction worker pool, created on first use and reused for every long PDF
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared extraction pool, creating it on first use.
+
+    Workers are spawned rather than forked: the Streamlit server is multi-threaded,
+    and forking a threaded process can deadlock.
+    """
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Returns the longest prefix of text that fits in max_tokens tokens.
+    """
+    # Encode only a window large enough for max_tokens so long documents aren't fully tokenized
+    window = text[:max_tokens * _MAX_CHARS_PER_TOKEN]
+    ids = _ENC.encode_ordinary(window)
+    if len(ids) < max_tokens and len(window) < len(text):
+        ids = _ENC.encode_ordinary(text)
+    return _ENC.decode(ids[:max_tokens])
+
 
 class PDFProcessor:
     def __init__(self):
         """
         Initialize the PDFProcessor class.
-        Sets up the tokenizer encoding using tiktoken.
+        Points at the shared module-level tiktoken encoding.
         This encoding helps determine how many tokens a text contains,
         which is important when working with models like OpenAI GPT.
         """
-        self.encoding = tiktoken.get_encoding("cl100k_base")
+        self.encoding = _ENC
 
-    def extract_text_from_pdf(self, pdf_file) -> str:
+    def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
         """
         Extracts all the text content from a PDF file.
 
         Args:
-            pdf_file: The uploaded PDF file object.
+            pdf_bytes: The raw bytes of the uploaded PDF file.
 
         Returns:
             A single string containing the text from all pages of the PDF.
         """
         try:
             # Read the PDF file
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-
-            # Loop through each page to extract text
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    # Extract text from the current page
-                    page_text = page.extract_text()
-                    # Append the extracted text with a page marker
-                    text += f"\n--- Page {page_num + 1} ---\n{page_text}"
-                except Exception as e:
-                    # If a page fails to extract, log and skip it
-                    print(f"Error extracting page {page_num + 1}: {e}")
-                    continue
-
-            return text
+            with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+                page_count = doc.page_count
+                workers = min(os.cpu_count() or 1, page_count // _PARALLEL_MIN_PAGES)
+
+                if workers <= 1:
+                    # Collect pieces in a list and join once; repeated += is quadratic on large PDFs
+                    return "".join(extract_pages(doc, 0, page_count))
+
+            # PyMuPDF is not thread-safe, so long documents are split into contiguous
+            # page ranges and extracted in separate processes, preserving page order
+            step = -(-page_count // workers)
+            starts = list(range(0, page_count, step))
+            stops = [min(start + step, page_count) for start in starts]
+            # Share one copy of the PDF with every worker instead of pickling it into each task
+            shm = shared_memory.SharedMemory(create=True, size=len(pdf_bytes))
+            try:
+                shm.buf[:len(pdf_bytes)] = pdf_bytes
+                results = _get_extract_pool().map(
+                    extract_shared_page_range, [shm.name] * len(starts), [len(pdf_bytes)] * len(starts), starts, stops
+                )
+                parts = [part for result in results for part in result]
+            finally:
+                shm.close()
+                shm.unlink()
+
+            return "".join(parts)
         except Exception as e:
             # Raise an error if the PDF could not be read at all
             raise Exception(f"Error reading PDF: {str(e)}")
@@ -58,7 +139,8 @@ class PDFProcessor:
         Cleans and normalizes the extracted text.
 
         Steps:
-        - Removes excessive whitespace
+        - Removes excessive whitespace, keeping blank lines between paragraphs
+          (extraction emits one per PDF text block, and page breaks count as one too)
         - Strips headers like "--- Page X ---"
         - Removes special characters (retains useful punctuation)
 
@@ -68,28 +150,22 @@ class PDFProcessor:
         Returns:
             A cleaned string with normalized formatting.
         """
-        # Replace multiple newlines with a single newline
-        text = re.sub(r'\n+', '\n', text)
+        # Remove page markers and special characters (except common punctuation) in one pass
+        text = _CLEAN_RE.sub(' ', text)
 
-        # Replace multiple spaces with a single space
-        text = re.sub(r' +', ' ', text)
+        # Collapse whitespace within each paragraph and keep paragraphs separated by one blank line
+        paragraphs = (' '.join(paragraph.split()) for paragraph in _PARA_RE.split(text))
+        text = '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
 
-        # Remove page markers like "--- Page 1 ---"
-        text = re.sub(r'--- Page \d+ ---', '', text)
-
-        # Remove special characters except common punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', ' ', text)
-
-        # Collapse any additional spaces
-        text = ' '.join(text.split())
-
-        return text.strip()
+        return text
 
     def count_tokens(self, text: str) -> int:
         """
         Counts the number of tokens in the text using the tokenizer.
 
         This is important for ensuring chunks of text stay within the model's limit.
+        Uses encode_ordinary, like chunk_text, so special-token text such as "<|endoftext|>"
+        in a PDF is counted as plain text rather than scanned for and rejected.
 
         Args:
             text: The input text.
@@ -97,13 +173,16 @@ class PDFProcessor:
         Returns:
             The number of tokens in the input text.
         """
-        return len(self.encoding.encode(text))
+        return len(_ENC.encode_ordinary(text))
 
     def chunk_text(self, text: str, max_tokens: int = 8000) -> List[str]:
         """
         Splits long text into smaller chunks that stay under a token limit.
 
         Useful when sending text to models that have a maximum token limit (e.g., GPT-4 has ~8k or ~32k limits).
+        Whole paragraphs (the PDF's text blocks, separated by blank lines) are packed together so
+        chunks break on paragraph boundaries; a paragraph is only split into sentences when it alone
+        exceeds the limit.
 
         Args:
             text: The cleaned input text.
@@ -112,50 +191,71 @@ class PDFProcessor:
         Returns:
             A list of text chunks (strings), each within the token limit.
         """
-        # Split the text into sentences using period + space as delimiter
-        sentences = text.split('. ')
-        chunks = []
-        current_chunk = ""
+        num_threads = os.cpu_count() or 1
+
+        # Tokenize every paragraph once in a single batch call instead of
+        # re-encoding the growing chunk for each appended piece
+        paragraphs = [paragraph for paragraph in _PARA_RE.split(text) if paragraph.strip()]
+        ids_per_paragraph = _ENC.encode_ordinary_batch(paragraphs, num_threads=num_threads)
+
+        # Build the units to pack: whole paragraphs where they fit, and sentences
+        # (keeping their own terminal punctuation) for paragraphs over the limit.
+        # Each unit carries the separator placed before it, and the +1 reserves
+        # budget for that separator.
+        units = []
+        for paragraph, ids in zip(paragraphs, ids_per_paragraph):
+            if len(ids) <= max_tokens:
+                units.append(("\n\n" + paragraph, len(ids) + 1))
+                continue
+
+            sentences = _SENT_RE.split(paragraph)
+            ids_per_sentence = _ENC.encode_ordinary_batch(sentences, num_threads=num_threads)
+            for i, (sentence, sentence_ids) in enumerate(zip(sentences, ids_per_sentence)):
+                units.append((("\n\n" if i == 0 else " ") + sentence, len(sentence_ids) + 1))
 
-        for sentence in sentences:
-            # Try adding the sentence to the current chunk
-            test_chunk = current_chunk + sentence + ". "
+        chunks = []
+        current_chunk: List[str] = []
+        current_tokens = 0
 
-            # If this new chunk exceeds the token limit
-            if self.count_tokens(test_chunk) > max_tokens and current_chunk:
+        for unit, unit_tokens in units:
+            # If adding this unit exceeds the token limit
+            if current_tokens + unit_tokens > max_tokens and current_chunk:
                 # Save the current chunk and start a new one
-                chunks.append(current_chunk.strip())
-                current_chunk = sentence + ". "
-            else:
-                # Otherwise, keep adding to the current chunk
-                current_chunk = test_chunk
+                chunks.append("".join(current_chunk).strip())
+                current_chunk = []
+                current_tokens = 0
+            # Otherwise, keep adding to the current chunk
+            current_chunk.append(unit)
+            current_tokens += unit_tokens
 
         # Add the final chunk if any content is left
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        final_chunk = "".join(current_chunk).strip()
+        if final_chunk:
+            chunks.append(final_chunk)
 
         return chunks
 
-    def get_pdf_metadata(self, pdf_file) -> Dict:
+    def get_pdf_metadata(self, pdf_bytes: bytes) -> Dict:
         """
         Extracts metadata from the PDF such as number of pages, title, author, and subject.
 
         Args:
-            pdf_file: The uploaded PDF file object.
+            pdf_bytes: The raw bytes of the uploaded PDF file.
 
         Returns:
             A dictionary containing metadata fields or error info.
         """
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-
-            # Extract standard metadata fields if available
-            metadata = {
-                'num_pages': len(pdf_reader.pages),
-                'title': pdf_reader.metadata.get('/Title', 'Unknown') if pdf_reader.metadata else 'Unknown',
-                'author': pdf_reader.metadata.get('/Author', 'Unknown') if pdf_reader.metadata else 'Unknown',
-                'subject': pdf_reader.metadata.get('/Subject', 'Unknown') if pdf_reader.metadata else 'Unknown'
-            }
+            with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
+                pdf_metadata = doc.metadata or {}
+
+                # Extract standard metadata fields if available
+                metadata = {
+                    'num_pages': doc.page_count,
+                    'title': pdf_metadata.get('title') or 'Unknown',
+                    'author': pdf_metadata.get('author') or 'Unknown',
+                    'subject': pdf_metadata.get('subject') or 'Unknown'
+                }
 
             return metadata
         except Exception as e:
@@ -1,15 +1,47 @@
+import asyncio
 import os
+import random
 from dotenv import load_dotenv
+from langchain_community.cache import SQLiteCache
 from langchain_openai import ChatOpenAI
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from typing import List, Dict
-import time
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from pdf_processor import truncate_to_tokens
+from typing import Callable, List, Dict, Optional
 
 load_dotenv()
 
+# Optional on-disk completion cache. Entries hold the full prompt (document text) and response
+# and are never evicted, so it is off unless LLM_CACHE_PATH is set. When enabled, any call whose
+# prompt is unchanged from an earlier run (including the streamed final summary, see
+# _astream_meta) is answered from disk; only chunks or sections that changed reach the API
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+
 class PDFSummarizer:
-    def __init__(self):
+    def __init__(self, max_concurrent: int = 3, requests_per_second: float = 5, max_retries: int = 3,
+                 reduce_fan_in: int = 8):
+        if reduce_fan_in < 2:
+            # Each reduce round must merge at least two summaries or it never terminates
+            raise ValueError(f"reduce_fan_in must be at least 2, got {reduce_fan_in}")
+
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        # Most section summaries combined by one meta call when reducing
+        self.reduce_fan_in = reduce_fan_in
+
+        # Token bucket shared by every call made through self.llm
+        self.rate_limiter = InMemoryRateLimiter(
+            requests_per_second=requests_per_second,
+            check_every_n_seconds=0.1,
+            max_bucket_size=max_concurrent,
+        )
+
+        self.llm_cache = SQLiteCache(database_path=LLM_CACHE_PATH) if LLM_CACHE_PATH else None
+
         self.llm = ChatOpenAI(
             model="openai/gpt-4.1-mini",
             temperature=0.3,
@@ -19,6 +51,9 @@ class PDFSummarizer:
                 "HTTP-Referer": "https://github.com/niti007/pdfsummarizer",
                 "X-Title": "PDF Summarizer",
             },
+            rate_limiter=self.rate_limiter,
+            # False rather than None so a globally configured LangChain cache isn't picked up either
+            cache=self.llm_cache if self.llm_cache is not None else False,
         )
 
         self.summary_prompts = {
@@ -72,59 +107,7 @@ Executive Summary:"""
             )
         }
 
-    def summarize_text(self, text: str, summary_type: str = 'detailed') -> str:
-        if summary_type not in self.summary_prompts:
-            summary_type = 'detailed'
-
-        chain = self.summary_prompts[summary_type] | self.llm | StrOutputParser()
-
-        try:
-            summary = chain.invoke({"text": text})
-            return summary
-        except Exception as e:
-            return f"Error generating summary: {str(e)}"
-
-    def summarize_chunks(self, chunks: List[str], summary_type: str = 'detailed') -> Dict:
-        chunk_summaries = []
-
-        print(f"Processing {len(chunks)} chunks...")
-        for i, chunk in enumerate(chunks):
-            print(f"Summarizing chunk {i+1}/{len(chunks)}...")
-            try:
-                summary = self.summarize_text(chunk, summary_type)
-                chunk_summaries.append({
-                    'chunk_number': i + 1,
-                    'summary': summary,
-                    'original_length': len(chunk),
-                    'summary_length': len(summary)
-                })
-                if i < len(chunks) - 1:
-                    time.sleep(1)  # rate limit control
-            except Exception as e:
-                chunk_summaries.append({
-                    'chunk_number': i + 1,
-                    'summary': f"Error processing chunk: {str(e)}",
-                    'original_length': len(chunk),
-                    'summary_length': 0
-                })
-
-        combined_summary = self.combine_summaries(chunk_summaries, summary_type)
-
-        return {
-            'individual_summaries': chunk_summaries,
-            'combined_summary': combined_summary,
-            'total_chunks': len(chunks),
-            'summary_type': summary_type
-        }
-
-    def combine_summaries(self, chunk_summaries: List[Dict], summary_type: str) -> str:
-        individual_summaries = [cs['summary'] for cs in chunk_summaries if 'Error' not in cs['summary']]
-        if not individual_summaries:
-            return "No valid summaries were generated."
-
-        combined_text = "\n\n".join([f"Section {i+1}: {summary}" for i, summary in enumerate(individual_summaries)])
-
-        meta_prompt = PromptTemplate(
+        self.meta_prompt = PromptTemplate(
             input_variables=["summaries", "summary_type"],
             template="""
 You have been provided with summaries from different sections of a document.
@@ -138,16 +121,7 @@ Section Summaries:
 Final Cohesive Summary:"""
         )
 
-        meta_chain = meta_prompt | self.llm | StrOutputParser()
-
-        try:
-            final_summary = meta_chain.invoke({"summaries": combined_text, "summary_type": summary_type})
-            return final_summary
-        except Exception as e:
-            return f"Combined Summary:\n\n{combined_text}"
-
-    def analyze_document_structure(self, text: str) -> Dict:
-        analysis_prompt = PromptTemplate(
+        self.analysis_prompt = PromptTemplate(
             input_variables=["text"],
             template="""
 Analyze the structure and content of this document. Provide:
@@ -163,16 +137,7 @@ Text: {text}
 Document Analysis:"""
         )
 
-        analysis_chain = analysis_prompt | self.llm | StrOutputParser()
-
-        try:
-            analysis = analysis_chain.invoke({"text": text[:3000]})
-            return {'analysis': analysis, 'status': 'success'}
-        except Exception as e:
-            return {'analysis': f"Error analyzing document: {str(e)}", 'status': 'error'}
-
-    def extract_key_quotes(self, text: str) -> List[str]:
-        quotes_prompt = PromptTemplate(
+        self.quotes_prompt = PromptTemplate(
             input_variables=["text"],
             template="""
 Extract 5-10 key quotes, statements, or important phrases from this text.
@@ -183,10 +148,168 @@ Text: {text}
 Key Quotes (one per line):"""
         )
 
-        quotes_chain = quotes_prompt | self.llm | StrOutputParser()
+        # Build every chain once; they are immutable, so per-call construction is wasted work
+        self.chains = {k: self._build_chain(p) for k, p in self.summary_prompts.items()}
+        self.meta_chain = self._build_chain(self.meta_prompt)
+        self.analysis_chain = self._build_chain(self.analysis_prompt)
+        self.quotes_chain = self._build_chain(self.quotes_prompt)
+        # Streaming path for the final summary; retry and caching are handled in _astream_meta
+        self.stream_llm = self.llm | StrOutputParser()
 
+    def _build_chain(self, prompt: PromptTemplate):
+        chain = prompt | self.llm | StrOutputParser()
+        return chain.with_retry(stop_after_attempt=self.max_retries, wait_exponential_jitter=True)
+
+    def _summary_chain(self, summary_type: str):
+        return self.chains.get(summary_type, self.chains['detailed'])
+
+    def summarize_text(self, text: str, summary_type: str = 'detailed') -> str:
+        chain = self._summary_chain(summary_type)
+
+        try:
+            summary = chain.invoke({"text": text})
+            return summary
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    async def _summarize_chunks_async(self, chunks: List[str], summary_type: str,
+                                      on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        chain = self._summary_chain(summary_type)
+
+        # One batched call per round; LangChain bounds the in-flight requests and
+        # retries only the inputs that failed
+        results = await chain.abatch(
+            [{"text": chunk} for chunk in chunks],
+            config={"max_concurrency": self.max_concurrent},
+            return_exceptions=True,
+        )
+
+        chunk_summaries = []
+        for i, (chunk, result) in enumerate(zip(chunks, results)):
+            if isinstance(result, Exception):
+                summary = f"Error generating summary: {str(result)}"
+                status = 'error'
+            else:
+                summary = result
+                status = 'success'
+            chunk_summaries.append({
+                'chunk_number': i + 1,
+                'status': status,
+                'summary': summary,
+                'original_length': len(chunk),
+                'summary_length': len(summary)
+            })
+
+        combined_summary = await self._combine_summaries_async(chunk_summaries, summary_type, on_token)
+
+        return {
+            'individual_summaries': chunk_summaries,
+            'combined_summary': combined_summary,
+            'total_chunks': len(chunks),
+            'summary_type': summary_type
+        }
+
+    def summarize_chunks(self, chunks: List[str], summary_type: str = 'detailed',
+                         on_token: Optional[Callable[[str], None]] = None) -> Dict:
+        """on_token, if given, is called with the final summary text so far as it streams in."""
+        print(f"Processing {len(chunks)} chunks...")
+        return asyncio.run(self._summarize_chunks_async(chunks, summary_type, on_token))
+
+    def _format_sections(self, summaries: List[str]) -> str:
+        return "\n\n".join([f"Section {i+1}: {summary}" for i, summary in enumerate(summaries)])
+
+    def _meta_inputs(self, summaries: List[str], summary_type: str) -> Dict:
+        return {"summaries": self._format_sections(summaries), "summary_type": summary_type}
+
+    async def _astream_meta(self, inputs: Dict, on_token: Callable[[str], None]) -> str:
+        """
+        Streams the meta summary to on_token with the same caching and retries as meta_chain.ainvoke.
+
+        Chat model streaming neither reads nor writes the LLM cache, and with_retry does not
+        cover astream, so both are done here: a cache hit (if the cache is enabled) is emitted whole, and a failed stream
+        is retried only while no token has reached the caller yet.
+        """
+        messages = self.meta_prompt.format_prompt(**inputs).to_messages()
+        if self.llm_cache is not None:
+            # Same key the chat model uses for invoke, so streamed and non-streamed calls share entries
+            prompt_key = dumps(messages)
+            llm_string = self.llm._get_llm_string()
+            cached = await self.llm_cache.alookup(prompt_key, llm_string)
+            if cached:
+                summary = cached[0].text
+                on_token(summary)
+                return summary
+
+        for attempt in range(1, self.max_retries + 1):
+            buffer = ""
+            try:
+                async for token in self.stream_llm.astream(messages):
+                    buffer += token
+                    on_token(buffer)
+                break
+            except Exception:
+                # Retrying after text has been shown would restart it mid-display
+                if buffer or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(2 ** (attempt - 1) + random.random())
+
+        if self.llm_cache is not None:
+            await self.llm_cache.aupdate(prompt_key, llm_string, [ChatGeneration(message=AIMessage(content=buffer))])
+        return buffer
+
+    async def _combine_summaries_async(self, chunk_summaries: List[Dict], summary_type: str,
+                                       on_token: Optional[Callable[[str], None]] = None) -> str:
+        individual_summaries = [cs['summary'] for cs in chunk_summaries if cs['status'] == 'success']
+        if not individual_summaries:
+            return "No valid summaries were generated."
+
+        # Tree-reduce: merge groups of up to reduce_fan_in summaries into brief summaries,
+        # one batched round per level, until a single meta call can take them all
+        level = individual_summaries
+        while len(level) > self.reduce_fan_in:
+            # Balance group sizes so the last group isn't a near-empty remainder
+            num_groups = -(-len(level) // self.reduce_fan_in)
+            group_size = -(-len(level) // num_groups)
+            groups = [level[i:i + group_size] for i in range(0, len(level), group_size)]
+
+            # A single summary has nothing to merge, so carry it forward rather than compress it
+            merge_groups = [group for group in groups if len(group) > 1]
+            group_inputs = [self._meta_inputs(group, 'brief') for group in merge_groups]
+            results = await self.meta_chain.abatch(
+                group_inputs,
+                config={"max_concurrency": self.max_concurrent},
+                return_exceptions=True,
+            )
+            # If a group fails, carry its already-joined sections forward as plain text
+            merged = iter([inputs['summaries'] if isinstance(result, Exception) else result
+                           for inputs, result in zip(group_inputs, results)])
+            level = [next(merged) if len(group) > 1 else group[0] for group in groups]
+
+        inputs = self._meta_inputs(level, summary_type)
+        try:
+            if on_token is None:
+                return await self.meta_chain.ainvoke(inputs)
+
+            # Stream so the caller can render the summary from the first token on
+            return await self._astream_meta(inputs, on_token)
+        except Exception as e:
+            # Fall back to the section text already joined for the prompt rather than joining again
+            return f"Combined Summary:\n\n{inputs['summaries']}"
+
+    def combine_summaries(self, chunk_summaries: List[Dict], summary_type: str,
+                          on_token: Optional[Callable[[str], None]] = None) -> str:
+        return asyncio.run(self._combine_summaries_async(chunk_summaries, summary_type, on_token))
+
+    def analyze_document_structure(self, text: str, max_tokens: int = 2000) -> Dict:
+        try:
+            analysis = self.analysis_chain.invoke({"text": truncate_to_tokens(text, max_tokens)})
+            return {'analysis': analysis, 'status': 'success'}
+        except Exception as e:
+            return {'analysis': f"Error analyzing document: {str(e)}", 'status': 'error'}
+
+    def extract_key_quotes(self, text: str) -> List[str]:
         try:
-            quotes_response = quotes_chain.invoke({"text": text})
+            quotes_response = self.quotes_chain.invoke({"text": text})
             quotes = [quote.strip() for quote in quotes_response.split('\n') if quote.strip()]
             return quotes[:10]
         except Exception as e:
@@ -1,11 +1,14 @@
 import streamlit as st
-import pandas as pd
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List
 import json
+import math
 import time
 import os
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 def display_processing_status(current_step: int, total_steps: int, step_name: str):
     """Display processing progress"""
     progress = current_step / total_steps
@@ -20,7 +23,7 @@ def format_summary_display(summary_data: Dict):
     with col1:
         st.metric("Total Chunks", summary_data['total_chunks'])
     with col2:
-        successful_summaries = len([s for s in summary_data['individual_summaries'] if 'Error' not in s['summary']])
+        successful_summaries = sum(1 for s in summary_data['individual_summaries'] if s['status'] == 'success')
         st.metric("Successful Summaries", successful_summaries)
     with col3:
         st.metric("Summary Type", summary_data['summary_type'].title())
@@ -55,23 +58,33 @@ def export_summary_to_text(summary_data: Dict, filename: str = "summary.txt") ->
 
     return content
 
-def create_summary_dataframe(summary_data: Dict) -> pd.DataFrame:
+def create_summary_dataframe(summary_data: Dict) -> "pd.DataFrame":
     """Create a DataFrame from summary data for analysis"""
-    data = []
-    for chunk_summary in summary_data['individual_summaries']:
-        data.append({
-            'Chunk': chunk_summary['chunk_number'],
-            'Original Length': chunk_summary['original_length'],
-            'Summary Length': chunk_summary['summary_length'],
-            'Compression Ratio': round(chunk_summary['summary_length'] / chunk_summary['original_length'], 2)
-            if chunk_summary['original_length'] != 0 else 0,
-            'Status': 'Success' if 'Error' not in chunk_summary['summary'] else 'Error'
-        })
-    return pd.DataFrame(data)
-
-def estimate_processing_time(num_chunks: int) -> str:
-    """Estimate processing time based on number of chunks"""
-    estimated_seconds = num_chunks ** 2.5
+    # Imported here so pandas is only loaded once results are exported
+    import numpy as np
+    import pandas as pd
+
+    summaries = summary_data['individual_summaries']
+    original_lengths = np.fromiter((cs['original_length'] for cs in summaries), dtype=np.int64, count=len(summaries))
+    summary_lengths = np.fromiter((cs['summary_length'] for cs in summaries), dtype=np.int64, count=len(summaries))
+
+    # Divide column-wise, leaving 0 where the original chunk was empty
+    ratios = np.zeros(len(summaries), dtype=np.float64)
+    np.divide(summary_lengths, original_lengths, out=ratios, where=original_lengths != 0)
+
+    succeeded = np.fromiter((cs['status'] == 'success' for cs in summaries), dtype=bool, count=len(summaries))
+
+    return pd.DataFrame({
+        'Chunk': [cs['chunk_number'] for cs in summaries],
+        'Original Length': original_lengths,
+        'Summary Length': summary_lengths,
+        'Compression Ratio': np.round(ratios, 2),
+        'Status': np.where(succeeded, 'Success', 'Error')
+    })
+
+def estimate_processing_time(num_chunks: int, per_call_s: float = 3.0, concurrency: int = 3) -> str:
+    """Estimate processing time from the number of chunks summarized concurrently"""
+    estimated_seconds = math.ceil(num_chunks * per_call_s / concurrency)
 
     if estimated_seconds < 60:
         return f"~{int(estimated_seconds)} seconds"